@@ -5,18 +5,25 @@ import socket
 import atexit
 import ctypes
 import logging
-import subprocess
+import threading
+from ctypes import wintypes
 from typing import Optional, Any
 
-import mss
 import cv2
-import psutil
+import dxcam
+import win32api
 import win32gui
+import win32process
+import win32com.client
 import numpy as np
-import pydirectinput
-import tomli as tomllib
+from numba import njit, prange
 from pydantic import BaseModel, ValidationError
 
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    import tomli as tomllib
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -65,7 +72,7 @@ class ConfigLoader:
             raise FileNotFoundError(f"Can't find configuration file: {path}")
 
         try:
-            with open(path, "rb") as f:
+            with open(full_path, "rb") as f:
                 data = tomllib.load(f)
             
             settings = Settings(**data)
@@ -79,53 +86,123 @@ class ConfigLoader:
             logger.error(f"Error loading Configuration file: {e}")
             sys.exit(1)
 
+# Windows Firewall COM API constants
+NET_FW_RULE_DIR_IN = 1
+NET_FW_RULE_DIR_OUT = 2
+NET_FW_ACTION_BLOCK = 0
+NET_FW_IP_PROTOCOL_TCP = 6
+NET_FW_PROFILE2_ALL = 0x7FFFFFFF
+
+# enough to read the image path, and not stripped by the game's anti-cheat like VM_READ is
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+
 class NetworkManager:
 
     def __init__(self):
         self.rule_name = "GTA5_BLOCK_RULE"
         self.target_processes = ["GTA5.exe", "GTA5_Enhanced.exe"]
+        self.window_title = "Grand Theft Auto V"
         self.cloud_save_domain: str = "cs-gta5-prod.ros.rockstargames.com"
         self.cloud_save_static_ip: str = "192.81.241.171"
 
-    def _get_gta_path(self) -> Optional[str]:
-        for proc in psutil.process_iter(['name', 'exe']):
+        # cloud save IPs rarely change, so a resolved address is reused for a while
+        self.dns_ttl: float = 300
+        self._cloud_ip: Optional[str] = None
+        self._cloud_ip_ts: float = 0
+
+        # firewall rules are managed in-process instead of spawning netsh for every change
+        self.fw = win32com.client.Dispatch("HNetCfg.FwPolicy2")
+
+    def _get_gta_path(self, hwnd: Optional[int] = None) -> Optional[str]:
+        """
+        Resolve the executable path from the game window instead of scanning every process.
+        """
+        try:
+            hwnd = hwnd or win32gui.FindWindow(None, self.window_title)
+            if not hwnd:
+                return None
+
+            _, pid = win32process.GetWindowThreadProcessId(hwnd)
+            handle = win32api.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+
             try:
-                if proc.info['name'] in self.target_processes and proc.info['exe']:
-                    return proc.info['exe']
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-        return None
+                buf = ctypes.create_unicode_buffer(32768)
+                size = wintypes.DWORD(len(buf))
+
+                if not ctypes.windll.kernel32.QueryFullProcessImageNameW(
+                    wintypes.HANDLE(int(handle)), 0, buf, ctypes.byref(size)
+                ):
+                    raise ctypes.WinError()
+
+                path = buf.value
+            finally:
+                win32api.CloseHandle(handle)
+
+        except Exception as e:
+            logger.error(f"Error | get GTA V path: {e}")
+            return None
+
+        if os.path.basename(path) not in self.target_processes:
+            return None
+
+        return path
     
     def _resolve_cloud_ip(self) -> Optional[str]:
+        if self._cloud_ip and time.time() - self._cloud_ip_ts < self.dns_ttl:
+            return self._cloud_ip
+
         try:
             ip = socket.gethostbyname(self.cloud_save_domain)
             logger.info(f"Resolved {self.cloud_save_domain} to {ip}")
+            self._cloud_ip = ip
+            self._cloud_ip_ts = time.time()
             return ip
         except socket.error as e:
             logger.error(f"Failed to resolve domain: {e}")
             return None
         
-    def _run_netsh(self, command: str) -> None:
+    def _add_rule(self, direction: int, **properties: Any) -> None:
         """
-        Execute a netsh command silently.
+        Add a block rule through the firewall COM API.
         """
         try:
-            subprocess.run(
-                command, 
-                shell=True, 
-                check=False, 
-                stdout=subprocess.DEVNULL, 
-                stderr=subprocess.DEVNULL
-            )
+            rule = win32com.client.Dispatch("HNetCfg.FWRule")
+            rule.Name = self.rule_name
+            rule.Direction = direction
+            rule.Action = NET_FW_ACTION_BLOCK
+            rule.Profiles = NET_FW_PROFILE2_ALL
+
+            for name, value in properties.items():
+                setattr(rule, name, value)
+
+            rule.Enabled = True
+            self.fw.Rules.Add(rule)
+        except Exception as e:
+            logger.error(f"Firewall rule creation failed: {e}")
+
+    def _delete_rules(self) -> None:
+        """
+        Remove every rule named after rule_name, Rules.Remove only drops one match per call.
+        """
+        try:
+            rules = self.fw.Rules
+
+            while True:
+                try:
+                    rules.Item(self.rule_name)
+                except Exception:
+                    break
+
+                rules.Remove(self.rule_name)
         except Exception as e:
-            logger.error(f"Netsh command execution failed: {e}")
+            logger.error(f"Firewall rule removal failed: {e}")
 
     def restore_network(self):
         logger.info("Restoring network connection...")
-        self._run_netsh(f'netsh advfirewall firewall delete rule name="{self.rule_name}"')
+        self._delete_rules()
         logger.info("Firewall rules cleaned up. Network restored.")
 
-    def block_network(self) -> bool:
+    def block_network(self, hwnd: Optional[int] = None) -> bool:
         logger.info("Attempting to block network connection...")
 
         dynamic_ip: Optional[str] = self._resolve_cloud_ip()
@@ -134,78 +211,143 @@ class NetworkManager:
             target_ips: str = f"{dynamic_ip},{self.cloud_save_static_ip}"
             logger.info(f"Blocking Cloud Save IPs: {target_ips}")
 
-            cmd: str = (
-                f'netsh advfirewall firewall add rule '
-                f'name="{self.rule_name}" '
-                f'dir=out '
-                f'action=block '
-                f'protocol=TCP '
-                f'remoteip="{target_ips}" '
-                f'enable=yes'
-            )
-            self._run_netsh(cmd)
+            self._add_rule(NET_FW_RULE_DIR_OUT, Protocol=NET_FW_IP_PROTOCOL_TCP, RemoteAddresses=target_ips)
 
         else:
             logger.warning("Could not resolve IP. Falling back to blocking GTA V executable.")
 
-            path = self._get_gta_path()
+            path = self._get_gta_path(hwnd)
 
             if not path:
                 logger.warning("Can't find GTA V")
                 return False
             
-            cmd_out: str = (
-                f'netsh advfirewall firewall add rule '
-                f'name="{self.rule_name}" '
-                f'dir=out '
-                f'action=block '
-                f'program="{path}" '
-                f'enable=yes'
-            )
-            self._run_netsh(cmd_out)
-
-            cmd_in: str = (
-                f'netsh advfirewall firewall add rule '
-                f'name="{self.rule_name}" '
-                f'dir=in '
-                f'action=block '
-                f'program="{path}" '
-                f'enable=yes'
-            )
-            self._run_netsh(cmd_in)
+            self._add_rule(NET_FW_RULE_DIR_OUT, ApplicationName=path)
+            self._add_rule(NET_FW_RULE_DIR_IN, ApplicationName=path)
 
         logger.info(f"{Colors.RED}Network blocked successfully.{Colors.RESET}")
         return True
     
+# no fastmath: reassociating win_sum * win_sum / n leaves flat windows with a tiny non-zero
+# variance, and DFT noise divided by it scores far above 1
+@njit(parallel=True, cache=True)
+def _ncc_peak(corr, sums, sq_sums, th, tw, norm):
+    """
+    Normalize the correlation map with the window statistics from the integral images
+    and return its peak value and position.
+    Window sum, sum of squares and the division are fused into one pass, rows run in parallel.
+    """
+    rows, cols = corr.shape
+    n = th * tw
+    row_max = np.empty(rows)
+    row_arg = np.empty(rows, np.int64)
+
+    for y in prange(rows):
+        best = -1.0
+        best_x = 0
+
+        for x in range(cols):
+            win_sum = sums[y + th, x + tw] - sums[y, x + tw] - sums[y + th, x] + sums[y, x]
+            win_sq = sq_sums[y + th, x + tw] - sq_sums[y, x + tw] - sq_sums[y + th, x] + sq_sums[y, x]
+
+            win_var = win_sq - win_sum * win_sum / n
+            val = 0.0
+
+            # same guards as OpenCV: skip near-flat windows and scores that can only be rounding noise
+            if win_var > n * 1e-3:
+                denom = np.sqrt(win_var) * norm
+                if abs(corr[y, x]) < 1.125 * denom:
+                    val = corr[y, x] / denom
+
+            if val > best:
+                best = val
+                best_x = x
+
+        row_max[y] = best
+        row_arg[y] = best_x
+
+    peak_y = np.argmax(row_max)
+    return row_max[peak_y], peak_y, row_arg[peak_y]
+
+# compile at import so the JIT cost isn't paid in the middle of a cycle,
+# once for the full-screen integrals and once for the sliced bottom-right view
+_ncc_peak(np.zeros((3, 3), np.float32)[:2, :2], np.zeros((3, 3)), np.zeros((3, 3)), 1, 1, 1.0)
+_ncc_peak(np.zeros((3, 3), np.float32)[:2, :2], np.zeros((4, 4))[1:, 1:], np.zeros((4, 4))[1:, 1:], 1, 1, 1.0)
+
 class SceneDetection:
 
     def __init__(self):
-        self.sct = mss.mss()
+        self.cam = dxcam.create(output_color="GRAY")
 
         self.window_title = "Grand Theft Auto V"
         self.template_dir = "templates"
         self.threshold = 0.8
-
+        self.scale = 0.5
+        # the half-scale score depends on the sub-pixel phase of the overlay (an odd offset costs
+        # up to ~0.25), so it only nominates candidates and the final check runs at native resolution
+        self.candidate_threshold = 0.6
+        self.confirm_margin = 3
+        self.coarse_scale = 0.25
+        # the gate threshold is calibrated per template; below this floor the gate is too loose to be worth running
+        self.coarse_min_score = 0.5
+        self.coarse_margin = 0.8
+        self.hash_max_distance = 10
+        self.hash_min_bits = 16
+        self.anchor_min_std = 8
+        self.hwnd_refresh = 2.0
+        # detection backs off while the scene is unchanged, but stays fast while nothing is
+        # visible since the next scene could be JOINING_ONLINE, which needs the network blocked quickly
+        self.interval = 0.05
+        self.max_interval = 0.5
+        self.idle_max_interval = 0.1
+
+        # run the DFT stage through the OpenCL T-API when a device is available
+        self.use_opencl = cv2.ocl.haveOpenCL()
+        cv2.ocl.setUseOpenCL(self.use_opencl)
+
+        # ordered by how often each scene shows up during a cycle, detection stops at the first match
         self.targets = {
-            "story_mode": {
-                "file": "story_mode.png",
-                "area": AreaType.FULL_SCREEN,
-                "scene": Scene.STORY_MODE
+            "transaction": {
+                "file": "transaction.png",
+                "area": AreaType.BOTTOM_RIGHT,
+                "scene": Scene.TRANSACTION
             },
             "joining_online": {
                 "file": "joining_online.png",
                 "area": AreaType.BOTTOM_RIGHT,
                 "scene": Scene.JOINING_ONLINE
             },
-            "transaction": {
-                "file": "transaction.png",
-                "area": AreaType.BOTTOM_RIGHT,
-                "scene": Scene.TRANSACTION
+            "story_mode": {
+                "file": "story_mode.png",
+                "area": AreaType.FULL_SCREEN,
+                "scene": Scene.STORY_MODE
             }
         }
 
         self.templates = {}
+        self._buffers = {}
+        self._frame = None
+
+        # where each template last matched, so the next ticks can try a hash comparison there first
+        self._anchors = {}
+
+        self._hwnd = None
+        self._hwnd_ts = 0
+        self._rect_cache = None
+        self._win_rect = None
+        self._region = None
+        self._capture_error_logged = False
+        # templates whose matching failed, so each failure is logged once per capture region
+        self._match_errors_logged = set()
+
+        # latest result published by the detection thread
+        self._cond = threading.Condition()
+        self._latest_scene = None
+        self._seq = 0
+        self._stopped = threading.Event()
+
         self._load_img()
+        logger.info(f"OpenCL acceleration: {'enabled' if self.use_opencl else 'unavailable'}")
 
     def _load_img(self):
         logger.info("Loading template images...")
@@ -218,86 +360,533 @@ class SceneDetection:
                 logger.warning(f"Template not found: {path}")
                 continue
             
-            img = cv2.imread(path)
+            img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
 
             if img is None:
                 logger.warning(f"Failed to read image: {path}")
                 continue
 
-            self.templates[name] = img
+            full = img
+            img = cv2.resize(img, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+
+            # template statistics never change, so the NCC terms that depend only on it are computed once
+            zero_mean = (img - img.mean()).astype(np.float32)
+
+            # a flat patch hashes to 0, so a hash with few set (or unset) bits would be
+            # within hash_max_distance of any blank screen; such templates skip the hash fast path
+            img_hash = self._dhash(img)
+            if min(img_hash.bit_count(), 64 - img_hash.bit_count()) < self.hash_min_bits:
+                img_hash = None
+
+            signature = cv2.resize(img, None, fx=self.coarse_scale, fy=self.coarse_scale, interpolation=cv2.INTER_AREA)
+
+            self.templates[name] = {
+                "full": full,
+                "zero_mean": zero_mean,
+                "norm": float(np.linalg.norm(zero_mean)),
+                "shape": img.shape,
+                "spectra": {},
+                # small uint8 copy used by the coarse NCC gate before running the full-resolution NCC
+                "signature": signature,
+                "gate_score": self._calibrate_gate(full, signature),
+                "hash": img_hash
+            }
             count += 1
         
         logger.info(f"Successfully loaded {count} templates.")
         
+    def _calibrate_gate(self, full: np.ndarray, signature: np.ndarray) -> Optional[float]:
+        """
+        Worst-case coarse score of an exact match, over every sub-pixel phase of the two-step downscale
+        and a few backgrounds, scaled by the margin. At 1/8 of native resolution thin text loses most of
+        its structure, so templates whose worst case falls below coarse_min_score skip the gate (None).
+        """
+        phases = round(1 / (self.scale * self.coarse_scale))
+        worst = 1.0
+
+        for border, value in ((cv2.BORDER_REPLICATE, 0), (cv2.BORDER_CONSTANT, 0), (cv2.BORDER_CONSTANT, 128), (cv2.BORDER_CONSTANT, 255)):
+            for dy in range(phases):
+                for dx in range(phases):
+                    canvas = cv2.copyMakeBorder(
+                        full, phases + dy, 2 * phases - dy, phases + dx, 2 * phases - dx, border, value=value
+                    )
+                    scaled = cv2.resize(canvas, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+                    coarse = cv2.resize(scaled, None, fx=self.coarse_scale, fy=self.coarse_scale, interpolation=cv2.INTER_AREA)
+
+                    result = cv2.matchTemplate(coarse, signature, cv2.TM_CCOEFF_NORMED)
+                    worst = min(worst, cv2.minMaxLoc(result)[1])
+
+        score = worst * self.coarse_margin
+        return score if score >= self.coarse_min_score else None
+
+    @staticmethod
+    def _dhash(img: np.ndarray) -> int:
+        """
+        64-bit difference hash: sign of the horizontal gradient on a 9x8 thumbnail.
+        """
+        small = cv2.resize(img, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = np.packbits(small[:, 1:] > small[:, :-1])
+        return int.from_bytes(bits.tobytes(), "big")
+
+    def _find_window(self, window_title: str) -> None:
+        self._hwnd = win32gui.FindWindow(None, window_title)
+        self._hwnd_ts = time.time()
+
     def _get_win_rect(self, window_title: str) -> Optional[dict]:
+        """
+        Return the window rect, looking the handle up again only every few seconds or when it goes stale.
+        The capture region is recomputed only when the rect changes.
+        """
         try:
-            hwnd = win32gui.FindWindow(None, window_title)
-            if hwnd:
-                rect = win32gui.GetWindowRect(hwnd)
-                win_rect = {"left": rect[0], "top": rect[1], "width": rect[2] - rect[0], "height": rect[3] - rect[1]}
-                return win_rect
+            if not self._hwnd or time.time() - self._hwnd_ts > self.hwnd_refresh:
+                self._find_window(window_title)
+
+            if not self._hwnd:
+                return None
+
+            try:
+                rect = win32gui.GetWindowRect(self._hwnd)
+            except win32gui.error:
+                self._find_window(window_title)
+                if not self._hwnd:
+                    return None
+                rect = win32gui.GetWindowRect(self._hwnd)
+
+            if rect != self._rect_cache:
+                self._rect_cache = rect
+                self._win_rect = {"left": rect[0], "top": rect[1], "width": rect[2] - rect[0], "height": rect[3] - rect[1]}
+                self._region = self._get_capture_region(self._win_rect)
+                self._capture_error_logged = False
+                self._match_errors_logged.clear()
+
+            return self._win_rect
         
         except Exception as e:
             logger.error(f"Error | get window rect: {e}")
             
         return None
     
-    def _get_capture_region(self, win_rect: dict, area_type: AreaType) -> dict:
+    def _get_capture_region(self, win_rect: dict) -> dict:
         region = win_rect.copy()
 
-        if area_type == AreaType.BOTTOM_RIGHT:
-            region["left"] = int(win_rect["left"] + win_rect["width"] * 0.6)
-            region["top"] = int(win_rect["top"] + win_rect["height"] * 0.7)
-            region["width"] = int(win_rect["width"] * 0.4)
-            region["height"] = int(win_rect["height"] * 0.3)
-
         if region["left"] < 0: region["left"] = 0
         if region["top"] < 0: region["top"] = 0
 
         return region
+
+    def _get_area_offset(self, shape: tuple, area_type: AreaType) -> tuple:
+        """
+        Return the top-left corner of the area inside a full window capture of the given shape.
+        """
+        if area_type == AreaType.BOTTOM_RIGHT:
+            height, width = shape
+            return int(height * 0.7), int(width * 0.6)
+
+        return 0, 0
+
+    def _get_area(self, img: np.ndarray, area_type: AreaType) -> np.ndarray:
+        """
+        Return a view of the area inside the full window capture.
+        """
+        top, left = self._get_area_offset(img.shape, area_type)
+        return img[top:, left:]
     
+    def _get_buffer(self, key: str, shape: tuple, dtype: Any = np.uint8) -> np.ndarray:
+        """
+        Return a reusable array for the given key, reallocating only when the shape changes.
+        """
+        buf = self._buffers.get(key)
+
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers[key] = buf
+
+        return buf
+
+    def _grab(self, region: dict) -> Optional[np.ndarray]:
+        """
+        Grab a grayscale frame of the region.
+        DXcam returns None when nothing changed since the last grab, so the previous frame is reused.
+        """
+        right = min(region["left"] + region["width"], self.cam.width)
+        bottom = min(region["top"] + region["height"], self.cam.height)
+
+        frame = self.cam.grab(region=(region["left"], region["top"], right, bottom))
+
+        if frame is None:
+            return self._frame
+
+        self._frame = frame.reshape(frame.shape[0], frame.shape[1])
+        return self._frame
+
+    def _disable_opencl(self) -> None:
+        """
+        Fall back to the CPU for the DFT stage, dropping the template spectra already uploaded to the device.
+        """
+        self.use_opencl = False
+        cv2.ocl.setUseOpenCL(False)
+
+        for template in self.templates.values():
+            template["spectra"].clear()
+
+    def _to_device(self, arr: np.ndarray) -> Any:
+        return cv2.UMat(arr) if self.use_opencl else arr
+
+    def _to_host(self, arr: Any) -> np.ndarray:
+        return arr.get() if isinstance(arr, cv2.UMat) else arr
+
+    def _get_spectrum(self, key: str, img: np.ndarray, dft_shape: tuple) -> np.ndarray:
+        """
+        Zero-pad the image to the DFT size and return its packed spectrum.
+        """
+        height, width = img.shape
+
+        padded = self._get_buffer(f"{key}_padded", dft_shape, np.float32)
+        padded[:height, :width] = img
+        padded[height:, :] = 0
+        padded[:height, width:] = 0
+
+        return cv2.dft(self._to_device(padded))
+
+    def _get_template_spectrum(self, template: dict, dft_shape: tuple) -> np.ndarray:
+        """
+        Return the template spectrum for the DFT size, computed once per capture size.
+        """
+        spectrum = template["spectra"].get(dft_shape)
+
+        if spectrum is None:
+            th, tw = template["shape"]
+            padded = cv2.copyMakeBorder(
+                template["zero_mean"], 0, dft_shape[0] - th, 0, dft_shape[1] - tw,
+                cv2.BORDER_CONSTANT, value=0
+            )
+            spectrum = cv2.dft(self._to_device(padded))
+            template["spectra"][dft_shape] = spectrum
+
+        return spectrum
+
+    def _passes_gate(self, coarse: np.ndarray, template: dict) -> bool:
+        """
+        Cheap pre-check on the uint8 1/4-scale copies: is there any position where the signature correlates with the coarse image.
+        Zero-mean like the full match, so brightness and gamma offsets don't reject real matches.
+        The threshold comes from _calibrate_gate, it only has to reject frames where the template is clearly absent.
+        """
+        if template["gate_score"] is None:
+            return True
+
+        result = cv2.matchTemplate(coarse, template["signature"], cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, _ = cv2.minMaxLoc(result)
+
+        return max_val >= template["gate_score"]
+
+    def _match(self, area: str, img: np.ndarray, template: dict, spectra: dict, integrals: tuple) -> tuple:
+        """
+        Return the peak normalized cross-correlation of the template over the image and its (y, x) position.
+        Equivalent to TM_CCOEFF_NORMED, with window statistics taken from integral images
+        and the template mean and norm precomputed at load time.
+        """
+        th, tw = template["shape"]
+        height, width = img.shape
+        dft_shape = (cv2.getOptimalDFTSize(height), cv2.getOptimalDFTSize(width))
+
+        # the image spectrum is shared by every template matched against the same area this tick
+        if area not in spectra:
+            spectra[area] = self._get_spectrum(area, img, dft_shape)
+
+        # the template is zero-mean, so plain correlation already equals the covariance term
+        product = cv2.mulSpectrums(spectra[area], self._get_template_spectrum(template, dft_shape), 0, conjB=True)
+        corr = self._to_host(cv2.idft(product, flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE))
+        corr = corr[:height - th + 1, :width - tw + 1]
+
+        sums, sq_sums = integrals
+
+        peak, y, x = _ncc_peak(corr, sums, sq_sums, th, tw, template["norm"])
+        return float(peak), (int(y), int(x))
+
+    def _confirm_full(self, gray: np.ndarray, template: dict, y: int, x: int) -> bool:
+        """
+        Re-check a half-scale candidate at (y, x) against the native-resolution template,
+        searching a few pixels around it to absorb the rounding of the downscale.
+        """
+        full = template["full"]
+        fh, fw = full.shape
+        fy, fx = round(y / self.scale), round(x / self.scale)
+        m = self.confirm_margin
+
+        window = gray[max(fy - m, 0):fy + fh + m, max(fx - m, 0):fx + fw + m]
+        if window.shape[0] < fh or window.shape[1] < fw:
+            return False
+
+        result = cv2.matchTemplate(window, full, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, _ = cv2.minMaxLoc(result)
+
+        return max_val >= self.threshold
+
+    def _matches_anchor(self, name: str, gray: np.ndarray, img: np.ndarray, template: dict) -> bool:
+        """
+        Fast path: compare the template hash with the patch where it matched last time,
+        then confirm at native resolution around that position.
+        A miss is not conclusive, the anchor is dropped and the caller falls back to the full match.
+        """
+        anchor = self._anchors.get(name)
+        if anchor is None or template["hash"] is None:
+            return False
+
+        shape, y, x = anchor
+        th, tw = template["shape"]
+        patch = img[y:y + th, x:x + tw]
+
+        if shape == img.shape and self._confirm_anchor(patch, template) and self._confirm_full(gray, template, y, x):
+            return True
+
+        del self._anchors[name]
+        return False
+
+    def _confirm_anchor(self, patch: np.ndarray, template: dict) -> bool:
+        # loading and black screens are low-texture, never let them through on the hash alone
+        if patch.std() < self.anchor_min_std:
+            return False
+
+        return (self._dhash(patch) ^ template["hash"]).bit_count() <= self.hash_max_distance
+
+    def _resize(self, key: str, img: np.ndarray, scale: float) -> np.ndarray:
+        height, width = img.shape
+        size = (round(width * scale), round(height * scale))
+
+        resized = self._get_buffer(key, (size[1], size[0]))
+        cv2.resize(img, size, dst=resized, interpolation=cv2.INTER_AREA)
+
+        return resized
+
+    def _capture(self) -> tuple:
+        """
+        Grab the whole window once and downscale it for matching.
+        Returns the native-resolution frame (kept for confirming candidates) and the downscaled one.
+        """
+        gray = self._grab(self._region)
+        if gray is None:
+            return None, None
+
+        return gray, self._resize("scaled", gray, self.scale)
+
+    def _find_template(self, name: str, area: AreaType, template: dict, gray: np.ndarray, img: np.ndarray, coarse: np.ndarray, cache: dict) -> bool:
+        if self._matches_anchor(name, gray, img, template):
+            return True
+
+        if not self._passes_gate(self._get_area(coarse, area), template):
+            return False
+
+        if cache["integrals"] is None:
+            cache["integrals"] = cv2.integral2(img, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+
+        integrals = cache["integrals"]
+        top, left = self._get_area_offset(img.shape, area)
+        area_integrals = (integrals[0][top:, left:], integrals[1][top:, left:])
+
+        max_val, (y, x) = self._match(area, img[top:, left:], template, cache["spectra"], area_integrals)
+
+        if max_val >= self.candidate_threshold and self._confirm_full(gray, template, top + y, left + x):
+            if template["hash"] is not None:
+                self._anchors[name] = (img.shape, top + y, left + x)
+            return True
+
+        return False
+
+    def _log_match_error(self, name: str, e: Exception) -> None:
+        if name not in self._match_errors_logged:
+            logger.error(f"Error | match {name}: {e}")
+            self._match_errors_logged.add(name)
+
     def detect_scene(self) -> Optional[Scene]:
-        win_rect = self._get_win_rect(self.window_title)
-        if not win_rect:
+        if not self._get_win_rect(self.window_title):
+            return None
+
+        try:
+            gray, img = self._capture()
+        except Exception as e:
+            # logged once per capture region, e.g. DXcam rejects windows outside the primary output
+            if not self._capture_error_logged:
+                logger.error(f"Error | capture window: {e}")
+                self._capture_error_logged = True
+            return None
+
+        if img is None:
             return None
+
+        coarse = self._resize("coarse", img, self.coarse_scale)
+        # per-tick work shared by all templates: one image spectrum per area and one pair of
+        # integral images for the whole capture, sliced per area since window sums only use differences
+        cache = {"spectra": {}, "integrals": None}
         
         for name, config in self.targets.items():
-            template_img = self.templates[name]
+            template = self.templates.get(name)
 
-            if template_img is None:
+            if template is None:
                 continue
 
-            capture_region = self._get_capture_region(win_rect, config['area'])
-
             try:
-                scr = self.sct.grab(capture_region)
-                img = np.array(scr)
-                img = img[:, :, :3]
-
-                result = cv2.matchTemplate(img, template_img, cv2.TM_CCOEFF_NORMED)
-                _, max_val, _, _ = cv2.minMaxLoc(result)
+                found = self._find_template(name, config['area'], template, gray, img, coarse, cache)
+            except cv2.error as e:
+                if not self.use_opencl:
+                    self._log_match_error(name, e)
+                    continue
 
-                if max_val >= self.threshold:
-                    return config['scene']
-                    break
+                logger.warning(f"OpenCL matching failed, falling back to CPU: {e}")
+                self._disable_opencl()
+                cache["spectra"].clear()
 
+                try:
+                    found = self._find_template(name, config['area'], template, gray, img, coarse, cache)
+                except Exception as e:
+                    self._log_match_error(name, e)
+                    continue
             except Exception as e:
-                pass
+                self._log_match_error(name, e)
+                continue
+
+            if found:
+                return config['scene']
 
         return None
+
+    @property
+    def hwnd(self) -> Optional[int]:
+        return self._hwnd or None
+
+    @property
+    def latest_scene(self) -> Optional[Scene]:
+        with self._cond:
+            return self._latest_scene
+
+    def wait_scene(self, timeout: float = 1.0) -> Optional[Scene]:
+        """
+        Block until the detection thread publishes its next result and return it.
+        Returns None if nothing is published within the timeout rather than repeating a stale scene.
+        """
+        with self._cond:
+            seq = self._seq
+            if not self._cond.wait_for(lambda: self._seq != seq, timeout):
+                logger.warning("Scene detection timed out")
+                return None
+            return self._latest_scene
+
+    def _next_interval(self, scene: Optional[Scene], unchanged_ticks: int) -> float:
+        """
+        Base interval, doubled every 10 consecutive ticks without a scene change, up to the cap.
+        """
+        cap = self.idle_max_interval if scene is None else self.max_interval
+        return min(self.interval * 2 ** min(unchanged_ticks // 10, 5), cap)
+
+    def run_forever(self):
+        prev_scene = None
+        unchanged_ticks = 0
+
+        while not self._stopped.is_set():
+            try:
+                scene = self.detect_scene()
+            except Exception as e:
+                # keep the thread alive, a dead thread would leave wait_scene without results
+                logger.error(f"Error | detect scene: {e}")
+                scene = None
+
+            unchanged_ticks = unchanged_ticks + 1 if scene == prev_scene else 0
+            prev_scene = scene
+
+            with self._cond:
+                self._latest_scene = scene
+                self._seq += 1
+                self._cond.notify_all()
+
+            self._stopped.wait(self._next_interval(scene, unchanged_ticks))
+
+    def start(self):
+        threading.Thread(target=self.run_forever, name="SceneDetection", daemon=True).start()
+        logger.info("Scene detection thread started.")
+
+    def stop(self):
+        self._stopped.set()
         
+INPUT_KEYBOARD = 1
+KEYEVENTF_EXTENDEDKEY = 0x0001
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_SCANCODE = 0x0008
+
+# DirectInput scan codes, arrow keys live on the extended (E0) page
+SCAN_CODES = {
+    "esc": (0x01, False),
+    "enter": (0x1C, False),
+    "up": (0x48, True),
+    "down": (0x50, True),
+    "left": (0x4B, True),
+    "right": (0x4D, True),
+}
+
+class KEYBDINPUT(ctypes.Structure):
+    _fields_ = [
+        ("wVk", wintypes.WORD),
+        ("wScan", wintypes.WORD),
+        ("dwFlags", wintypes.DWORD),
+        ("time", wintypes.DWORD),
+        ("dwExtraInfo", ctypes.c_size_t)
+    ]
+
+class MOUSEINPUT(ctypes.Structure):
+    _fields_ = [
+        ("dx", wintypes.LONG),
+        ("dy", wintypes.LONG),
+        ("mouseData", wintypes.DWORD),
+        ("dwFlags", wintypes.DWORD),
+        ("time", wintypes.DWORD),
+        ("dwExtraInfo", ctypes.c_size_t)
+    ]
+
+class HARDWAREINPUT(ctypes.Structure):
+    _fields_ = [
+        ("uMsg", wintypes.DWORD),
+        ("wParamL", wintypes.WORD),
+        ("wParamH", wintypes.WORD)
+    ]
+
+class INPUT(ctypes.Structure):
+    class _INPUT(ctypes.Union):
+        # SendInput checks cbSize, so the union has to be as large as the biggest member
+        _fields_ = [("ki", KEYBDINPUT), ("mi", MOUSEINPUT), ("hi", HARDWAREINPUT)]
+
+    _anonymous_ = ("_input",)
+    _fields_ = [("type", wintypes.DWORD), ("_input", _INPUT)]
+
+def _key_input(scan_code: int, extended: bool, key_up: bool) -> INPUT:
+    flags = KEYEVENTF_SCANCODE
+    if extended: flags |= KEYEVENTF_EXTENDEDKEY
+    if key_up: flags |= KEYEVENTF_KEYUP
+
+    return INPUT(type=INPUT_KEYBOARD, ki=KEYBDINPUT(wScan=scan_code, dwFlags=flags))
+
 class KeyboardController:
 
     def __init__(self, hold_time: float = 0.1, wait_time: float = 0.55):
         self.hold = hold_time
         self.wait = wait_time
 
-        pydirectinput.PAUSE = 0.01
+        # key down / key up events are built once and reused for every press
+        self._inputs = {
+            key: (_key_input(scan, extended, False), _key_input(scan, extended, True))
+            for key, (scan, extended) in SCAN_CODES.items()
+        }
 
-    def press(self, key: Any):
-        pydirectinput.keyDown(key)
+        # 1ms scheduler resolution so hold/wait sleeps don't overshoot by a full 15.6ms tick
+        ctypes.windll.winmm.timeBeginPeriod(1)
+        atexit.register(ctypes.windll.winmm.timeEndPeriod, 1)
+
+    def _send(self, event: INPUT):
+        ctypes.windll.user32.SendInput(1, ctypes.byref(event), ctypes.sizeof(INPUT))
+
+    def press(self, key: str):
+        key_down, key_up = self._inputs[key]
+
+        self._send(key_down)
         time.sleep(self.hold)
-        pydirectinput.keyUp(key)
+        self._send(key_up)
         time.sleep(self.wait)
 
     def to_online(self):
@@ -334,9 +923,11 @@ def is_admin() -> bool:
     except Exception:
         return False
     
+# sys.argv[0] never changes at runtime, so the base directory is resolved once
+_BASE_PATH = os.path.dirname(os.path.abspath(sys.argv[0]))
+
 def get_resource_path(relative_path: str):
-    base_path = os.path.dirname(os.path.abspath(sys.argv[0]))
-    return os.path.join(base_path, relative_path)
+    return os.path.join(_BASE_PATH, relative_path)
     
 def main(config: Settings):
     if not is_admin():
@@ -375,6 +966,7 @@ def main(config: Settings):
     print("\n>>> 開始執行腳本")
     
     network_manager.restore_network()
+    scene_detection.start()
 
     try:
         for i in range(config.system.execution):
@@ -391,7 +983,7 @@ def main(config: Settings):
             keyboard_controller.to_online()
 
             while True:
-                scene = scene_detection.detect_scene()
+                scene = scene_detection.wait_scene()
 
                 if scene and scene != last_scene:
                     logger.info(f"Scene Detected: {Colors.BLUE}{scene}{Colors.RESET}")
@@ -399,9 +991,8 @@ def main(config: Settings):
 
                 if scene == Scene.JOINING_ONLINE:
                     if not is_network_blocked:
-                        network_manager.block_network()
+                        network_manager.block_network(scene_detection.hwnd)
                         is_network_blocked = True
-                    time.sleep(0.5)
                     continue
 
                 if scene == Scene.TRANSACTION:
@@ -422,7 +1013,6 @@ def main(config: Settings):
                         keyboard_controller.to_offline()
                         is_returning_offline = True
 
-                    time.sleep(0.1) 
                     continue
 
                 if is_returning_offline and scene == Scene.STORY_MODE:
@@ -434,16 +1024,16 @@ def main(config: Settings):
                         logger.info("Network restored. Cycle complete.")
                         break
 
-                time.sleep(0.1)
-
             logger.info(f"Cycle {cycle_num} logic finished.")
             
     except KeyboardInterrupt:
         logger.info("Script interrupted by user.")
+        scene_detection.stop()
         network_manager.restore_network()
         return
 
     logger.info("All execution cycles completed.")
+    scene_detection.stop()
     network_manager.restore_network()
             
 if __name__ == "__main__":